@@ -80,6 +80,23 @@ elif TTS_PROVIDER == "openai":
     print(f"  OpenAI Default Save Format: {OPENAI_TTS_DEFAULT_FORMAT}")
     # Add validation for format if desired (mp3, opus, aac, flac, wav, pcm)
 
+# Cache synthesized OpenAI audio on disk, so repeated lines are replayed without another API call (off unless enabled)
+OPENAI_TTS_DISK_CACHE = os.getenv("OPENAI_TTS_DISK_CACHE", "false").lower() in ("1", "true", "yes")
+try:
+    OPENAI_TTS_DISK_CACHE_MB = int(os.getenv("OPENAI_TTS_DISK_CACHE_MB", "200"))
+except ValueError:
+    print("Warning: OPENAI_TTS_DISK_CACHE_MB in .env is not a valid integer. Using default 200 MB.")
+    OPENAI_TTS_DISK_CACHE_MB = 200
+# Playback buffer size in frames; 0 picks a power of two (128-1024) from the device's low output latency
+try:
+    OPENAI_TTS_BLOCKSIZE = int(os.getenv("OPENAI_TTS_BLOCKSIZE", "0"))
+except ValueError:
+    print("Warning: OPENAI_TTS_BLOCKSIZE in .env is not a valid integer. Using automatic block size.")
+    OPENAI_TTS_BLOCKSIZE = 0
+if TTS_PROVIDER == "openai":
+    print(f"  OpenAI Disk Cache: {f'on ({OPENAI_TTS_DISK_CACHE_MB} MB)' if OPENAI_TTS_DISK_CACHE else 'off'}")
+    print(f"  OpenAI Playback Block Size: {OPENAI_TTS_BLOCKSIZE or 'auto'}")
+
 
 # --- File Paths ---
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__)) # Get the directory where config.py lives
@@ -89,6 +106,7 @@ os.makedirs(DATA_DIR, exist_ok=True) # Ensure data directory exists
 # MODIFIED: File paths are now provider-specific to avoid conflicts.
 VOICES_PATH = os.path.join(DATA_DIR, f"{TTS_PROVIDER}_voices.json")
 MAPPING_PATH = os.path.join(DATA_DIR, f"{TTS_PROVIDER}_character_voices.json")
+OPENAI_TTS_CACHE_DIR = os.path.join(DATA_DIR, "openai_tts_cache") # Created on first use
 print(f"Using voices cache path: {VOICES_PATH}")
 print(f"Using character map path: {MAPPING_PATH}")
 
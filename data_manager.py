@@ -1,14 +1,17 @@
 import json
 import os
 
+from utils import json_dumps, json_loads
+
+
 def load_json_data(filepath: str, default: dict = None) -> dict:
     """Safely loads JSON data from a file."""
     if default is None:
         default = {}
     try:
         if os.path.exists(filepath):
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(filepath, 'rb') as f:
+                return json_loads(f.read())
         else:
             print(f"Info: File not found: {filepath}. Starting with default data.")
             return default
@@ -27,8 +30,8 @@ def save_json_data(data: dict, filepath: str):
     try:
         # Ensure the directory exists
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        with open(filepath, 'wb') as f:
+            f.write(json_dumps(data))
         # print(f"Data successfully saved to {filepath}") # Optional: uncomment for verbose saving
     except IOError as e:
         print(f"Error: Could not write to file {filepath}. Reason: {e}")
@@ -5,6 +5,7 @@ import keyboard # For listening to key presses
 from PIL import ImageGrab # For taking screenshots
 import argparse # Keep argparse for potential future flags
 import traceback
+import logging
 
 # --- Standard Project Imports ---
 import config
@@ -42,6 +43,8 @@ except Exception as e:
 request_exit = False
 # Flag to prevent processing multiple screenshots simultaneously if key held down
 is_processing = False
+# How long exit waits for a line still being processed, so its new character mapping is saved
+EXIT_WAIT_SECONDS = 60.0
 
 # --- Core Processing Function ---
 def run_analysis_pipeline(image_path: str, voice_selector_instance: voice_selector.VoiceSelector, trigger_time: float): # Add trigger_time
@@ -89,13 +92,15 @@ def run_analysis_pipeline(image_path: str, voice_selector_instance: voice_select
 
         # --- 2. Voice Selection ---
         t_start_select = time.perf_counter()
-        # Pass the newly generated persona to be stored *if* the character is new.
-        # This function now returns BOTH the voice_id and the stored/new persona.
-        selected_voice_id, stored_persona = voice_selector_instance.find_or_assign_voice(
-            char_name,
-            gender,
-            generated_persona # Provide the freshly generated persona
-        )
+        # Known characters keep their stored voice and persona. A new character's voice is only
+        # proposed here; it is stored with the freshly generated persona once the line was spoken.
+        pending_voice = None
+        known_voice = voice_selector_instance.get_voice(char_name)
+        if known_voice is not None:
+            selected_voice_id, stored_persona = known_voice
+        else:
+            selected_voice_id, pending_voice = voice_selector_instance.propose_voice(char_name, gender)
+            stored_persona = generated_persona if pending_voice is not None else "" # 'Unknown' gets no persona
         t_end_select = time.perf_counter()
         select_duration = t_end_select - t_start_select
         print(f"  [Time] Voice Selection & Persona Store/Retrieve: {select_duration:.4f} seconds")
@@ -145,6 +150,8 @@ def run_analysis_pipeline(image_path: str, voice_selector_instance: voice_select
                 t_end_tts = time.perf_counter()
                 tts_duration = t_end_tts - t_start_tts
                 print(f"  [Time] TTS Synthesis + Playback (Total): {tts_duration:.3f} seconds")
+                if success and pending_voice is not None:
+                    voice_selector_instance.commit_voice(pending_voice, generated_persona) # Keep the voice the character was heard with
                 if not success:
                     print("[Pipeline] Failed to synthesize or play audio.")
             else:
@@ -152,7 +159,7 @@ def run_analysis_pipeline(image_path: str, voice_selector_instance: voice_select
         else:
             print("[Pipeline] No dialogue found to speak.")
 
-        # Save Mapping if Updated (VoiceSelector handles the flag)
+        # Save Mapping if Updated (VoiceSelector handles the flag and batches writes; flushed on exit)
         voice_selector_instance.save_map()
 
     else:
@@ -240,6 +247,9 @@ def signal_exit():
 
 # --- Main Execution ---
 if __name__ == "__main__":
+    # Show the TTS modules' status messages (logged at INFO) like the other console output
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING) # httpx logs every request at INFO
     parser = argparse.ArgumentParser(description="Listens for a hotkey to capture screen, analyze, and speak dialogue.")
     # Add arguments if needed in the future, e.g., --trigger-key
     # parser.add_argument("--trigger-key", default="`", help="Hotkey to trigger screenshot capture.")
@@ -315,4 +325,12 @@ if __name__ == "__main__":
             keyboard.unhook_all()
         except Exception as e:
             print(f"Warning: Error unhooking keyboard listeners: {e}")
+        # The pipeline runs on the keyboard hook thread; let a line that is still playing
+        # finish, so the voice it commits for a new character is included in the flush
+        if is_processing:
+            print("Waiting for the current line to finish...")
+            exit_deadline = time.monotonic() + EXIT_WAIT_SECONDS
+            while is_processing and time.monotonic() < exit_deadline:
+                time.sleep(0.1)
+        vs.flush() # Write character mappings whose save was deferred
         print("Script finished.")
\ No newline at end of file
@@ -1,4 +1,5 @@
 import argparse
+import logging
 import os
 import time # ADDED: Import time for timing measurements
 
@@ -37,6 +38,9 @@ except Exception as e:
 
 # --- Main Execution ---
 if __name__ == "__main__":
+    # Show the TTS modules' status messages (logged at INFO) like the other console output
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING) # httpx logs every request at INFO
     parser = argparse.ArgumentParser(description="Process screenshot, map character to voice, speak dialogue.")
     parser.add_argument("image_path", help="Path to the screenshot image file.")
     parser.add_argument(
@@ -122,12 +126,15 @@ if __name__ == "__main__":
 
         # --- Get Voice ID (Local Logic) ---
         t_start_select = time.perf_counter()
-        # MODIFIED: Pass generated_persona and capture both voice_id and stored_persona
-        selected_voice_id, stored_persona = vs.find_or_assign_voice(
-            char_name,
-            gender,
-            generated_persona # Provide the freshly generated persona
-        )
+        # Known characters keep their stored voice and persona. A new character's voice is only
+        # proposed here; it is stored with the freshly generated persona once the line was spoken.
+        pending_voice = None
+        known_voice = vs.get_voice(char_name)
+        if known_voice is not None:
+            selected_voice_id, stored_persona = known_voice
+        else:
+            selected_voice_id, pending_voice = vs.propose_voice(char_name, gender)
+            stored_persona = generated_persona if pending_voice is not None else "" # 'Unknown' gets no persona
         t_end_select = time.perf_counter()
         select_duration = t_end_select - t_start_select
         print(f"  [Time] Voice Selection & Persona Store/Retrieve: {select_duration:.4f} seconds")
@@ -178,6 +185,8 @@ if __name__ == "__main__":
                 t_end_tts = time.perf_counter()
                 tts_duration = t_end_tts - t_start_tts
                 print(f"  [Time] TTS Synthesis + Playback/Save (Total): {tts_duration:.3f} seconds")
+                if success and pending_voice is not None:
+                    vs.commit_voice(pending_voice, generated_persona) # Keep the voice the character was heard with
                 if not success:
                     print("[Pipeline] Failed to synthesize or play/save audio.")
             else:
@@ -186,7 +195,7 @@ if __name__ == "__main__":
             print("[Pipeline] No dialogue found in the screenshot to speak.")
 
         # --- Save Mapping if Updated ---
-        vs.save_map() # Saves the map if find_or_assign_voice updated it
+        vs.flush() # Saves the map if a new character was committed (single run, so don't defer)
 
     else:
         print("Failed to get character information from the screenshot.")
@@ -12,6 +12,7 @@ import google.genai as genai
 from google.genai import types
 
 import config
+from utils import fade_in_curve, get_output_device, invalidate_output_device
 
 # --- New Debugging Flag ---
 # Set to True to get detailed logs about audio buffer status, False for normal operation.
@@ -44,6 +45,11 @@ GEMINI_TTS_SAMPLERATE = 24000
 GEMINI_TTS_CHANNELS = 1
 GEMINI_TTS_DTYPE = np.int16
 
+FADE_DURATION_MS = 5 # Fade-in applied to the first streamed chunk to avoid a 'pop'
+
+# Build the curve once at import, keeping it off the first utterance's path
+fade_in_curve(GEMINI_TTS_SAMPLERATE, FADE_DURATION_MS, 'float32')
+
 def synthesize(
     text: str,
     voice_id: str,
@@ -129,20 +135,20 @@ def synthesize(
                             break 
 
                 if audio_content_bytes_chunk:
-                    temp_np_chunk = np.frombuffer(audio_content_bytes_chunk, dtype=GEMINI_TTS_DTYPE).copy()
-                    
                     if first_chunk_from_api:
-                        fade_duration_ms = 5
-                        fade_samples = int(GEMINI_TTS_SAMPLERATE * (fade_duration_ms / 1000.0))
-                        fade_samples = min(fade_samples, len(temp_np_chunk))
+                        # Only the first chunk is modified (faded in), so only it needs a writeable copy
+                        temp_np_chunk = np.frombuffer(audio_content_bytes_chunk, dtype=GEMINI_TTS_DTYPE).copy()
+                        fade_curve = fade_in_curve(GEMINI_TTS_SAMPLERATE, FADE_DURATION_MS, 'float32')
+                        fade_samples = min(len(fade_curve), len(temp_np_chunk))
 
                         if fade_samples > 0:
-                            fade_curve = np.linspace(0.0, 1.0, fade_samples, dtype=np.float32)**2
-                            temp_np_chunk[:fade_samples] = (temp_np_chunk[:fade_samples].astype(np.float32) * fade_curve).astype(GEMINI_TTS_DTYPE)
+                            head = temp_np_chunk[:fade_samples]
+                            np.multiply(head, fade_curve[:fade_samples], out=head, casting='unsafe') # In place, no temporaries
                         
                         first_chunk_from_api = False 
-
-                    audio_content_bytes_chunk_processed = temp_np_chunk.tobytes()
+                        audio_content_bytes_chunk_processed = temp_np_chunk.tobytes()
+                    else:
+                        audio_content_bytes_chunk_processed = audio_content_bytes_chunk # Passed through unchanged
                     
                     producer_audio_queue.put(audio_content_bytes_chunk_processed)
                     if not producer_started_streaming_event.is_set():
@@ -249,19 +255,23 @@ def synthesize(
         t_playback_start_wall = time.perf_counter()
 
         try:
-            device_info = sd.query_devices(kind='output')
+            device_info = get_output_device()
             output_channels = device_info.get('max_output_channels', GEMINI_TTS_CHANNELS)
             if output_channels <= 0: output_channels = GEMINI_TTS_CHANNELS 
         except Exception as dev_e:
             print(f"    [Warning] Failed to query output device info: {dev_e}. Defaulting to source channels ({GEMINI_TTS_CHANNELS}).")
             output_channels = GEMINI_TTS_CHANNELS
 
-        stream = sd.OutputStream(
-            samplerate=GEMINI_TTS_SAMPLERATE,
-            channels=output_channels,
-            dtype=GEMINI_TTS_DTYPE,
-            callback=audio_playback_callback
-        )
+        try:
+            stream = sd.OutputStream(
+                samplerate=GEMINI_TTS_SAMPLERATE,
+                channels=output_channels,
+                dtype=GEMINI_TTS_DTYPE,
+                callback=audio_playback_callback
+            )
+        except sd.PortAudioError:
+            invalidate_output_device() # The device may have changed; re-query next time
+            raise
         
         with stream:
             # ... (stream waiting logic is unchanged)
@@ -1,10 +1,11 @@
 import os
 from google.cloud import texttospeech
 import config
+from utils import fade_in_curve, get_output_device, invalidate_output_device
 import io
 import time
+import functools
 import numpy as np # Need numpy for audio data manipulation
-import threading # Need threading for event synchronization
 import traceback # For detailed error printing
 
 # Optional: For audio playback directly (requires sounddevice, soundfile)
@@ -16,6 +17,13 @@ except ImportError:
     print("Warning: 'sounddevice' or 'soundfile' not installed. Google TTS playback disabled.")
     SOUND_LIBS_AVAILABLE = False
 
+# Optional: JIT-compiled copy + fade for the mono playback callback (requires numba)
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 # --- Initialize Client ---
 # Authentication is handled implicitly if GOOGLE_APPLICATION_CREDENTIALS is set
 try:
@@ -26,6 +34,167 @@ except Exception as e:
     print("Ensure 'GOOGLE_APPLICATION_CREDENTIALS' environment variable is set correctly.")
     google_client = None
 
+# --- Audio Helpers ---
+
+FADE_DURATION_MS = 5  # Fade-in applied at the start of playback to avoid a 'pop' (e.g., 3-10 ms)
+
+# Build the curve for the configured output rate at import, keeping it off the first utterance's path
+fade_in_curve(config.TARGET_SAMPLE_RATE, FADE_DURATION_MS, 'float32')
+
+SILENCE_FRAMES = 8192 # Largest callback buffer served from the silence template (larger ones are zero-filled)
+
+@functools.lru_cache(maxsize=8)
+def _silence(channels: int, dtype_str: str) -> np.ndarray:
+    """
+    Returns a zeroed (SILENCE_FRAMES, channels) block copied into the tail of the last buffer.
+    The block is cached and shared between calls, so it is marked read-only.
+    """
+    block = np.zeros((SILENCE_FRAMES, channels), dtype=np.dtype(dtype_str))
+    block.flags.writeable = False
+    return block
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, fastmath=True, nogil=True, boundscheck=False)
+    def _fill_mono(audio, out, start, fade_curve, fade_n):
+        """Copies audio[start:start + len(out)] into out[:, 0], fading in frames below fade_n."""
+        for i in range(out.shape[0]):
+            j = start + i
+            if j < fade_n:
+                out[i, 0] = audio[j] * fade_curve[j]
+            else:
+                out[i, 0] = audio[j]
+
+    # Compile the LINEAR16 (read-only int16) and decoded (float32) signatures up front,
+    # so the first utterance doesn't pay the JIT cost inside the audio callback.
+    _warm_curve = fade_in_curve(1000, FADE_DURATION_MS, 'float32')
+    _fill_mono(np.frombuffer(bytes(8), dtype=np.int16), np.zeros((4, 1), dtype=np.int16), 0, _warm_curve, 2)
+    _fill_mono(np.zeros(4, dtype=np.float32), np.zeros((4, 1), dtype=np.float32), 0, _warm_curve, 2)
+else:
+    _fill_mono = None
+
+# --- Playback Callbacks ---
+# The channel layout is fixed once the stream is opened, so the copy routine for that
+# layout is picked per utterance and stored on its _PlaybackState, instead of re-checking
+# shapes on every audio tick. Callbacks are module-level functions bound to the state
+# with functools.partial.
+
+class _PlaybackState:
+    """Per-utterance playback position and audio, read by the stream callback."""
+    __slots__ = ('audio_data', 'total_frames', 'current_frame', 'channels', 'fade_curve', 'fade_samples', 'copy_fn', 'silence')
+
+    def __init__(self, audio_data, fade_curve, fade_samples, silence):
+        self.audio_data = audio_data
+        self.total_frames = len(audio_data)
+        self.current_frame = 0
+        self.channels = audio_data.shape[1] if audio_data.ndim > 1 else 1
+        self.fade_curve = fade_curve
+        self.fade_samples = fade_samples
+        self.copy_fn = None
+        self.silence = silence
+
+# Copy routines: write a chunk of source frames into an equally long slice of outdata.
+# Multi-channel sources on mono outputs never get here, they are downmixed before playback.
+
+def _copy_mono_to_mono(out, chunk):
+    out[:, 0] = chunk
+
+def _copy_mono_to_multi(out, chunk):
+    out[:] = chunk[:, np.newaxis] # Same signal on every output channel
+
+def _copy_matched(out, chunk):
+    out[:] = chunk
+
+def _copy_tile(out, chunk):
+    """More output channels than source channels: copy the source, silence the rest."""
+    channels = chunk.shape[1]
+    out[:, :channels] = chunk
+    out[:, channels:] = 0
+
+def _copy_truncate(out, chunk):
+    """Fewer output channels than source channels: take the first output_channels."""
+    out[:] = chunk[:, :out.shape[1]]
+
+def _fill_silence(state, out):
+    """Silences out by copying from the state's silence template."""
+    n = len(out)
+    if n <= SILENCE_FRAMES:
+        np.copyto(out, state.silence[:n])
+    else:
+        out[:] = 0
+
+def _callback_failed(outdata, cb_e: Exception):
+    """Silences the buffer and stops the stream after a callback error."""
+    print(f"    [Error in audio_callback] {type(cb_e).__name__}: {cb_e}")
+    traceback.print_exc()
+    outdata[:] = 0 # Silence on error
+    raise sd.CallbackStop # Stop the stream; the waiting thread sees it go inactive
+
+def _audio_callback(state, outdata, frames, time_info, status):
+    """Copies the next chunk with state.copy_fn, fading in the first fade_samples frames."""
+    if status:
+        print(f"    [TTS Playback Status] {status}")
+    try:
+        current_frame = state.current_frame
+        chunk_size = min(state.total_frames - current_frame, frames)
+        if chunk_size <= 0:
+            _fill_silence(state, outdata)
+            raise sd.CallbackStop
+
+        out = outdata[:chunk_size]
+        state.copy_fn(out, state.audio_data[current_frame : current_frame + chunk_size])
+        if current_frame < state.fade_samples:
+            fade_end = min(current_frame + chunk_size, state.fade_samples)
+            faded = out[:fade_end - current_frame]
+            np.multiply(faded, state.fade_curve[current_frame:fade_end, np.newaxis], out=faded, casting='unsafe')
+        state.current_frame = current_frame + chunk_size
+
+        if chunk_size < frames: # Last chunk: pad with silence and stop
+            _fill_silence(state, outdata[chunk_size:])
+            raise sd.CallbackStop
+    except sd.CallbackStop:
+        raise
+    except Exception as cb_e:
+        _callback_failed(outdata, cb_e)
+
+def _audio_callback_mono_jit(state, outdata, frames, time_info, status):
+    """Mono to mono callback whose copy + fade runs in the numba-compiled _fill_mono."""
+    if status:
+        print(f"    [TTS Playback Status] {status}")
+    try:
+        current_frame = state.current_frame
+        chunk_size = min(state.total_frames - current_frame, frames)
+        if chunk_size <= 0:
+            _fill_silence(state, outdata)
+            raise sd.CallbackStop
+
+        _fill_mono(state.audio_data, outdata[:chunk_size], current_frame, state.fade_curve, state.fade_samples)
+        state.current_frame = current_frame + chunk_size
+
+        if chunk_size < frames: # Last chunk: pad with silence and stop
+            _fill_silence(state, outdata[chunk_size:])
+            raise sd.CallbackStop
+    except sd.CallbackStop:
+        raise
+    except Exception as cb_e:
+        _callback_failed(outdata, cb_e)
+
+def _make_playback_callback(audio_data, output_channels, fade_curve, fade_samples):
+    """Binds a new _PlaybackState, with the copy routine for the channel layout, to a callback."""
+    state = _PlaybackState(audio_data, fade_curve, fade_samples, _silence(output_channels, audio_data.dtype.str))
+    channels = state.channels
+    if channels == 1 and output_channels == 1:
+        if _fill_mono is not None:
+            return functools.partial(_audio_callback_mono_jit, state)
+        state.copy_fn = _copy_mono_to_mono
+    elif channels == 1:
+        state.copy_fn = _copy_mono_to_multi
+    elif channels == output_channels:
+        state.copy_fn = _copy_matched
+    else:
+        print(f"    [Warning] Mismatched audio channels. Source: {channels}, Output: {output_channels}. Attempting mix/tile.")
+        state.copy_fn = _copy_tile if output_channels > channels else _copy_truncate
+    return functools.partial(_audio_callback, state)
+
 # --- Standardized Functions ---
 
 def synthesize(text: str, voice_id: str, output_filename: str | None = None) -> bool:
@@ -91,8 +260,6 @@ def synthesize(text: str, voice_id: str, output_filename: str | None = None) ->
         played_successfully = False
         playback_duration = 0.0
         if SOUND_LIBS_AVAILABLE and audio_content:
-            playback_finished_event = threading.Event()
-            current_frame = 0
             audio_data = None
             samplerate = 0
             stream = None # Define stream variable outside try
@@ -105,143 +272,75 @@ def synthesize(text: str, voice_id: str, output_filename: str | None = None) ->
 
                 if actual_encoding == texttospeech.AudioEncoding.LINEAR16:
                      # Assuming 16-bit signed integers based on LINEAR16
-                     # Create a temporary read-only view first
-                     temp_audio_data = np.frombuffer(audio_content, dtype=np.int16)
+                     # A read-only view is enough, playback never modifies the samples
+                     audio_data = np.frombuffer(audio_content, dtype=np.int16)
                      samplerate = audio_config.sample_rate_hertz # Use rate from request
-                     # Create a writeable copy for modifications (like fade-in)
-                     audio_data = temp_audio_data.copy() # <<<--- CREATE WRITEABLE COPY
                      # Note: Google LINEAR16 is typically mono. If stereo is ever returned, shaping might be needed:
                      # if audio_data.shape[0] % 2 == 0: # Basic check
                      #     try: audio_data = audio_data.reshape(-1, 2)
                      #     except ValueError: pass # Keep as mono if reshape fails
                 else: # Fallback to reading MP3 or other encoded formats using soundfile
                     print(f"    [TTS] Decoding audio format (assuming non-LINEAR16)...")
-                    # soundfile reads into float format by default unless dtype specified
-                    temp_audio_data, samplerate = sf.read(io.BytesIO(audio_content))
-                    # Create a writeable copy
-                    audio_data = temp_audio_data.copy() # <<<--- CREATE WRITEABLE COPY
+                    # soundfile already returns a fresh array, and playback never modifies it
+                    audio_data, samplerate = sf.read(io.BytesIO(audio_content), dtype='float32', always_2d=False)
                     # Use the samplerate reported by soundfile
                     if samplerate != audio_config.sample_rate_hertz:
                          print(f"    [Warning] Samplerate from decoded file ({samplerate} Hz) differs from requested rate ({audio_config.sample_rate_hertz} Hz). Using decoded rate.")
 
 
-                # Optional: Check if the copy is writeable (for debugging)
-                # print(f"    [Debug] Audio data is writeable: {audio_data.flags.writeable}")
-
                 if audio_data is None or len(audio_data) == 0:
                      print("Error: Failed to decode audio data for playback.")
                      raise ValueError("Empty or undecodable audio data") # Prevent proceeding
 
-                # ---> ADD FADE-IN (Operates on the writeable copy) <---
-                fade_duration_ms = 5  # Adjust fade duration (e.g., 3-10 ms)
-                fade_samples = int(samplerate * (fade_duration_ms / 1000.0))
-                fade_samples = min(fade_samples, len(audio_data)) # Ensure fade is not longer than audio
-
-                if fade_samples > 0:
-                    print(f"Applying {fade_duration_ms}ms fade-in ({fade_samples} samples)...")
-                    # Ensure fade_curve has the same dtype as audio_data or can be safely cast
-                    fade_curve = np.linspace(0.0, 1.0, fade_samples, dtype=audio_data.dtype)**2 # Quadratic fade-in
-
-                    # Apply the fade using in-place multiplication
-                    if audio_data.ndim == 1: # Mono
-                        audio_data[:fade_samples] *= fade_curve
-                    elif audio_data.ndim > 1: # Stereo or more channels
-                        # Ensure fade_curve is broadcastable (needs extra dimension)
-                        audio_data[:fade_samples, :] *= fade_curve[:, np.newaxis]
-                    else:
-                         print("Warning: audio_data has unexpected dimensions for fade-in.")
-                # ---> END FADE-IN <---
+                # The fade-in is applied inside audio_callback while the first frames are
+                # copied to the output buffer, so audio_data itself is never modified.
+                # The curve is always float32 so integer (LINEAR16) audio gets a real fade.
+                fade_curve = fade_in_curve(samplerate, FADE_DURATION_MS, 'float32')
+                fade_samples = min(len(fade_curve), len(audio_data)) # Ensure fade is not longer than audio
 
 
                 channels = audio_data.shape[1] if audio_data.ndim > 1 else 1
                 print(f"    [TTS] Starting streaming playback ({samplerate} Hz, {channels} ch, dtype: {audio_data.dtype})...")
 
-                def audio_callback(outdata, frames, time_info, status):
-                    """Callback function for sounddevice stream."""
-                    nonlocal current_frame
-                    if status:
-                        print(f"    [TTS Playback Status] {status}")
-
-                    try:
-                        chunk_size = min(len(audio_data) - current_frame, frames)
-                        if chunk_size <= 0:
-                            print("    [TTS Playback] Reached end of data (chunk_size <= 0).")
-                            outdata[:] = 0 # Fill buffer with silence
-                            playback_finished_event.set()
-                            raise sd.CallbackStop
-
-                        chunk = audio_data[current_frame : current_frame + chunk_size]
-
-                        # --- Shape Handling Logic ---
-                        outdata_channels = outdata.shape[1] # Channels expected by the output buffer
-
-                        # Fill the valid part of the buffer first
-                        if channels == 1 and outdata_channels == 1:
-                            outdata[:chunk_size, 0] = chunk # Assign mono to mono column
-                        elif channels == 1 and outdata_channels > 1:
-                             # Tile mono chunk to multiple output channels
-                             outdata[:chunk_size, :] = chunk.reshape(-1, 1)
-                        elif channels > 1 and outdata_channels == 1:
-                             # Mix down multi-channel chunk to mono output
-                             outdata[:chunk_size, 0] = chunk.mean(axis=1)
-                        elif channels == outdata_channels:
-                             # Direct copy (e.g., stereo->stereo)
-                             outdata[:chunk_size] = chunk
-                        else: # Mismatched channels (more complex case)
-                             print(f"    [Warning] Mismatched audio channels. Source: {channels}, Output: {outdata_channels}. Attempting mix/tile.")
-                             # Simple mix/tile fallback (might not sound ideal)
-                             if outdata_channels > channels: # Tile source to output
-                                 outdata[:chunk_size, :channels] = chunk
-                                 outdata[:chunk_size, channels:] = 0 # Silence extra channels
-                             else: # Mix source down to output
-                                 outdata[:chunk_size, :] = chunk[:,:outdata_channels] # Take first output_channels
-
-                        # Fill remaining buffer with silence if chunk was smaller than frames
-                        if chunk_size < frames:
-                            outdata[chunk_size:] = 0
-                            # Signal end only when the last actual data is sent
-                            if current_frame + chunk_size >= len(audio_data):
-                                print("    [TTS Playback] Reached end of data (chunk_size < frames).")
-                                playback_finished_event.set()
-                                raise sd.CallbackStop
-
-                        current_frame += chunk_size
-                        # --- End Shape Handling ---
-
-                    except Exception as cb_e:
-                        print(f"    [Error in audio_callback] {type(cb_e).__name__}: {cb_e}")
-                        traceback.print_exc()
-                        outdata[:] = 0 # Silence on error
-                        playback_finished_event.set() # Ensure main thread isn't blocked
-                        raise sd.CallbackStop # Stop the stream
-
                 t_playback_start = time.perf_counter()
 
                 # Create and start the stream
                 # Determine output channels based on default device capability if possible
                 try:
-                    device_info = sd.query_devices(kind='output')
                     # Use device's max channels if available, else match source audio
-                    output_channels = device_info.get('max_output_channels', channels)
+                    output_channels = get_output_device()['max_output_channels']
                      # Safety check: don't request 0 channels
                     if output_channels <= 0:
                          print(f"    [Warning] Device query returned invalid channels ({output_channels}). Defaulting to source channels ({channels}).")
                          output_channels = channels
-                    print(f"    [SoundDevice] Using output device: {sd.query_devices(kind='output')['name']} with {output_channels} channels.")
 
                 except Exception as dev_e:
                     print(f"    [Warning] Failed to query output device info: {dev_e}. Defaulting to source channels ({channels}).")
                     output_channels = channels # Fallback if device query fails
 
+                # Downmix once up front for mono outputs, rather than averaging channels on every callback tick
+                if channels > 1 and output_channels == 1:
+                    mono_data = np.add.reduce(audio_data, axis=1, dtype=np.float32)
+                    mono_data *= 1.0 / channels
+                    audio_data = mono_data.astype(audio_data.dtype, copy=False)
+                    channels = 1
+
+                audio_callback = _make_playback_callback(
+                    audio_data, output_channels, fade_curve, fade_samples)
                 stream = sd.OutputStream(
                     samplerate=samplerate,
                     channels=output_channels, # Use queried/fallback output channels
                     dtype=audio_data.dtype, # Use the actual dtype of the loaded data
                     callback=audio_callback)
                 with stream:
-                    # Wait for the callback to signal completion (or error)
-                    if not playback_finished_event.wait(timeout=len(audio_data)/samplerate + 5.0): # Add timeout buffer
-                         print("    [Warning] Playback finished event timed out. Stream might not have completed naturally.")
+                    # The callback raises CallbackStop at the end of the audio, which makes the stream
+                    # inactive once the last buffer has played. The deadline is only a safety net.
+                    deadline = time.perf_counter() + len(audio_data)/samplerate + stream.latency + 0.5
+                    while stream.active and time.perf_counter() < deadline:
+                        sd.sleep(50)
+                    finished_naturally = not stream.active
+                    if not finished_naturally:
+                         print("    [Warning] Playback timed out. Stream might not have completed naturally.")
                          # Ensure stream is stopped if timeout occurs
                          if stream.active:
                              try: stream.stop()
@@ -251,13 +350,13 @@ def synthesize(text: str, voice_id: str, output_filename: str | None = None) ->
                 playback_duration = t_playback_end - t_playback_start
                 # Note: playback_duration measures wall time, not necessarily audio length
                 print(f"    [Time] Audio Playback Duration (Wall Time): {playback_duration:.3f} seconds")
-                played_successfully = playback_finished_event.is_set() # Consider successful if event was set
+                played_successfully = finished_naturally
 
             except sd.PortAudioError as pae:
                  print(f"PortAudio Error during playback setup or execution: {pae}")
                  traceback.print_exc()
+                 invalidate_output_device() # The device may have changed; re-query next time
                  if stream is not None: stream.close() # Close on PortAudio error
-                 playback_finished_event.set() # Ensure wait() doesn't block
             except Exception as e:
                 print(f"Error during streaming playback setup or execution: {type(e).__name__}: {e}")
                 traceback.print_exc() # Print full traceback
@@ -267,11 +366,6 @@ def synthesize(text: str, voice_id: str, output_filename: str | None = None) ->
                         stream.close() # Ensure stream resources are released on error
                     except Exception as close_e:
                          print(f"    Error stopping/closing audio stream on error: {close_e}")
-                playback_finished_event.set() # Ensure wait() doesn't block forever on error
-            finally:
-                 # Ensure event is set if error happened before wait()
-                 if not playback_finished_event.is_set():
-                      playback_finished_event.set()
 
 
         elif not SOUND_LIBS_AVAILABLE:
@@ -1,14 +1,42 @@
 import os
+import asyncio
+import atexit
+import contextlib
 import requests
 import config
+from utils import get_output_device, invalidate_output_device, json_dumps, json_loads
 import io
+import hashlib
+import collections
+import concurrent.futures
 import time
 import numpy as np
 import threading
-import traceback
+import logging
+
+logger = logging.getLogger(__name__)
 
 # --- Constants ---
 OPENAI_API_URL = "https://api.openai.com/v1/audio/speech"
+OPENAI_REQUEST_TIMEOUT = (10.0, 60.0) # (connect, read) timeouts in seconds
+
+# Optional: HTTP/2 client (requires httpx[http2]). Concurrent requests, such as prefetching
+# the next line during playback, then share one multiplexed connection to the API.
+try:
+    import httpx
+    _CLIENT = httpx.Client(
+        http2=True, # Raises ImportError if the 'h2' extra is missing
+        timeout=httpx.Timeout(OPENAI_REQUEST_TIMEOUT[1], connect=OPENAI_REQUEST_TIMEOUT[0]),
+        limits=httpx.Limits(max_connections=4, max_keepalive_connections=4))
+    _SESSION = None
+    _REQUEST_ERRORS = (httpx.HTTPError,)
+except ImportError:
+    # Fallback: shared requests session (HTTP/1.1), so consecutive requests still
+    # reuse pooled keep-alive connections to the API (urllib3 already sets TCP_NODELAY)
+    _CLIENT = None
+    _SESSION = requests.Session()
+    _SESSION.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    _REQUEST_ERRORS = (requests.exceptions.RequestException,)
 
 # Optional: For audio playback directly (requires sounddevice, soundfile)
 try:
@@ -19,50 +47,530 @@ except ImportError:
     print("Warning: 'sounddevice' or 'soundfile' not installed. OpenAI TTS playback disabled.")
     SOUND_LIBS_AVAILABLE = False
 
+# Optional: MP3 decoding for playback (requires miniaudio). MP3 responses are several
+# times smaller than WAV, which shortens the download before playback can start.
+try:
+    import miniaudio
+    MINIAUDIO_AVAILABLE = True
+except ImportError:
+    MINIAUDIO_AVAILABLE = False
+
+OPENAI_TTS_SAMPLERATE = 24000 # OpenAI TTS always synthesizes at 24 kHz
+
 # --- Check API Key ---
 OPENAI_API_KEY = getattr(config, 'OPENAI_API_KEY', None)
 if not OPENAI_API_KEY:
     print("Error: OPENAI_API_KEY not found in config.py. OpenAI TTS module disabled.")
 else:
     print("OpenAI API Key found.")
+    # Authenticate every request from the shared client/session
+    (_CLIENT or _SESSION).headers["Authorization"] = f"Bearer {OPENAI_API_KEY}"
 
-# --- Standardized Functions ---
+# --- Response Cache ---
 
-def synthesize(
-    text: str,
-    voice_id: str,
-    output_filename: str | None = None,
-    instructions: str | None = None
-    ) -> bool:
+DISK_CACHE_ENABLED = getattr(config, 'OPENAI_TTS_DISK_CACHE', False)
+DISK_CACHE_DIR = getattr(config, 'OPENAI_TTS_CACHE_DIR', None)
+DISK_CACHE_MAX_BYTES = getattr(config, 'OPENAI_TTS_DISK_CACHE_MB', 200) * 1024 * 1024
+MEMORY_CACHE_MAX_BYTES = 64 * 1024 * 1024 # In-process cache in front of the disk cache
+
+_memory_cache = collections.OrderedDict() # key -> response bytes, least recently used first
+_memory_cache_bytes = 0
+_memory_cache_lock = threading.Lock()
+
+def _cache_key(body: bytes) -> str:
     """
-    Synthesizes text using OpenAI TTS, optionally using persona instructions with
-    compatible models (e.g., gpt-4o-mini-tts). This implementation uses a robust
-    "Download-Then-Play" model.
-    Returns True on success, False on failure.
+    Returns the cache key for a serialized request body.
+    The body holds the text, voice, model, format and instructions, so it identifies the audio.
     """
-    if not OPENAI_API_KEY:
-        print("Error: OpenAI API Key not configured. Cannot synthesize.")
+    return hashlib.sha1(body).hexdigest()
+
+def _memory_cache_get(key: str) -> bytes | None:
+    """Returns the in-process cached bytes for key (marking them recently used), or None."""
+    with _memory_cache_lock:
+        data = _memory_cache.get(key)
+        if data is not None:
+            _memory_cache.move_to_end(key)
+        return data
+
+def _memory_cache_put(key: str, data: bytes):
+    """Caches bytes in process, evicting the least recently used entries past MEMORY_CACHE_MAX_BYTES."""
+    global _memory_cache_bytes
+    if len(data) > MEMORY_CACHE_MAX_BYTES:
+        return
+    with _memory_cache_lock:
+        old = _memory_cache.pop(key, None)
+        if old is not None:
+            _memory_cache_bytes -= len(old)
+        _memory_cache[key] = data
+        _memory_cache_bytes += len(data)
+        while _memory_cache_bytes > MEMORY_CACHE_MAX_BYTES:
+            _, evicted = _memory_cache.popitem(last=False)
+            _memory_cache_bytes -= len(evicted)
+
+def _disk_cache_enabled() -> bool:
+    return bool(DISK_CACHE_ENABLED and DISK_CACHE_DIR)
+
+def _cache_load(key: str) -> bytes | None:
+    """Returns the cached response bytes for key from memory, then disk, or None on a miss."""
+    data = _memory_cache_get(key)
+    if data is not None or not _disk_cache_enabled():
+        return data
+    path = os.path.join(DISK_CACHE_DIR, key)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path) # Mark as recently used for trimming
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.warning("Could not read OpenAI TTS cache entry '%s': %s", path, e)
+        return None
+    if not data:
+        return None
+    _memory_cache_put(key, data)
+    return data
+
+def _cache_store(key: str, data: bytes):
+    """
+    Caches response bytes in memory and, if enabled, atomically on disk,
+    then trims the oldest disk entries past the size limit.
+    """
+    if not data:
+        return
+    _memory_cache_put(key, data)
+    if not _disk_cache_enabled():
+        return
+    path = os.path.join(DISK_CACHE_DIR, key)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(DISK_CACHE_DIR, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path) # Readers never see a partially written entry
+    except OSError as e:
+        logger.warning("Could not write OpenAI TTS cache entry '%s': %s", path, e)
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return
+    _cache_trim()
+
+def _cache_trim():
+    """Deletes the least recently used cache entries until the cache fits DISK_CACHE_MAX_BYTES."""
+    try:
+        entries = []
+        total_bytes = 0
+        for entry in os.scandir(DISK_CACHE_DIR):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total_bytes += st.st_size
+    except OSError as e:
+        logger.warning("Could not scan OpenAI TTS cache directory '%s': %s", DISK_CACHE_DIR, e)
+        return
+    if total_bytes <= DISK_CACHE_MAX_BYTES:
+        return
+    entries.sort() # Oldest first
+    for _, size, path in entries:
+        try:
+            os.remove(path)
+            total_bytes -= size
+        except OSError:
+            continue
+        if total_bytes <= DISK_CACHE_MAX_BYTES:
+            break
+
+# --- Streaming Playback ---
+
+STREAM_CHUNK_BYTES = 4800 # HTTP read size for the streamed 'pcm' response (100 ms of 24 kHz 16-bit audio)
+RING_BUFFER_SECONDS = 30  # Audio the ring buffer can hold before the download waits for playback
+RING_STALL_SECONDS = 2.0  # A full ring whose reader hasn't moved for this long means playback stopped
+FADE_DURATION_MS = 5      # Fade-in at the start of each utterance, avoids a click
+
+# Quadratic fade-in curve as Q15 fixed point (32767 ~ 1.0), applied to the int16 samples
+_FADE_IN = (np.linspace(0.0, 1.0, OPENAI_TTS_SAMPLERATE * FADE_DURATION_MS // 1000) ** 2 * 32767).astype(np.int16)
+
+def _apply_fade_in(samples: np.ndarray, pos: int):
+    """Fades int16 samples in place, given they start pos samples into the utterance."""
+    if pos < len(_FADE_IN):
+        n = min(len(samples), len(_FADE_IN) - pos)
+        faded = np.multiply(samples[:n], _FADE_IN[pos:pos + n], dtype=np.int32)
+        faded >>= 15
+        samples[:n] = faded
+
+class _RingBuffer:
+    """
+    Single-producer/single-consumer int16 ring buffer between the download thread and
+    the sounddevice callback. Each index is only advanced by its own side, so no lock is
+    needed (plain int assignment is atomic under the GIL).
+    """
+
+    def __init__(self, capacity: int):
+        self.buffer = np.zeros(capacity, dtype=np.int16)
+        self.capacity = capacity
+        self.write_idx = 0 # Total samples written (producer only)
+        self.read_idx = 0  # Total samples read (consumer only)
+        self.eof = False   # Producer is done, write_idx is final
+        self.closed = False # Consumer stopped, producer should give up
+        self.finished = threading.Event() # Set by the stream callback once drained
+
+    def write(self, samples: np.ndarray) -> bool:
+        """
+        Copies samples in, waiting for free space. Returns False if the consumer stopped,
+        or stopped reading for RING_STALL_SECONDS (the ring is then closed).
+        """
+        pos = 0
+        total = len(samples)
+        stalled_at = None # (read_idx, time) when the buffer was last seen full without progress
+        while pos < total:
+            if self.closed:
+                return False
+            read_idx = self.read_idx
+            free = self.capacity - (self.write_idx - read_idx)
+            if free <= 0:
+                now = time.monotonic()
+                if stalled_at is None or stalled_at[0] != read_idx:
+                    stalled_at = (read_idx, now)
+                elif now - stalled_at[1] > RING_STALL_SECONDS: # The callback stopped draining
+                    self.closed = True
+                    return False
+                time.sleep(0.01) # Buffer full, let playback catch up
+                continue
+            n = min(free, total - pos)
+            start = self.write_idx % self.capacity
+            first = min(n, self.capacity - start)
+            self.buffer[start:start + first] = samples[pos:pos + first]
+            if n > first: # Wrap around
+                self.buffer[:n - first] = samples[pos + first:pos + n]
+            self.write_idx += n
+            pos += n
+        return True
+
+    def read_into(self, out: np.ndarray) -> int:
+        """Copies up to len(out) available samples into out. Returns the number copied."""
+        n = min(self.write_idx - self.read_idx, len(out))
+        if n <= 0:
+            return 0
+        start = self.read_idx % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self.buffer[start:start + first]
+        if n > first: # Wrap around
+            out[first:n] = self.buffer[:n - first]
+        self.read_idx += n
+        return n
+
+    @property
+    def drained(self) -> bool:
+        """True once the producer finished and every sample has been read."""
+        return self.eof and self.read_idx == self.write_idx
+
+# --- Persistent Output Stream ---
+# One output stream stays open for the life of the process, so each utterance skips the
+# PortAudio device open/close. Utterances are handed to its callback as ring buffers.
+
+_STREAM = None       # Long-lived sd.OutputStream, opened on first playback
+_ACTIVE_RING = None  # Ring buffer the callback is currently playing, or None for silence
+_PLAYBACK_LOCK = threading.Lock() # One utterance at a time on the shared stream
+
+BLOCKSIZE_MIN, BLOCKSIZE_MAX = 128, 1024 # Range for the automatic playback block size
+
+def _stream_blocksize(device_info: dict | None) -> int:
+    """
+    Returns the playback block size in frames: config.OPENAI_TTS_BLOCKSIZE if set, otherwise the
+    device's low output latency in frames, rounded to the nearest power of two in [128, 1024].
+    A fixed, small block keeps the delay before the first audible sample predictable.
+    """
+    blocksize = getattr(config, 'OPENAI_TTS_BLOCKSIZE', 0)
+    if blocksize > 0:
+        return blocksize
+    latency = (device_info or {}).get('default_low_output_latency') or 0.0
+    frames = latency * OPENAI_TTS_SAMPLERATE
+    if frames <= BLOCKSIZE_MIN:
+        return BLOCKSIZE_MIN
+    return min(BLOCKSIZE_MAX, 1 << int(round(np.log2(frames))))
+
+def _stream_callback(outdata, frames, time_info, status):
+    """Plays the active ring buffer (mono, copied to every output channel), or silence when idle."""
+    global _ACTIVE_RING
+    if status:
+        logger.debug("    [TTS Playback Status] %s", status)
+    ring = _ACTIVE_RING
+    if ring is None:
+        outdata.fill(0)
+        return
+    out = outdata[:, 0]
+    start = ring.read_idx
+    n = ring.read_into(out)
+    _apply_fade_in(out[:n], start) # Faded while emitting, so the audio is only touched once
+    if n < frames:
+        out[n:] = 0 # Underrun (download behind playback) or end of audio: play silence
+        if ring.drained:
+            _ACTIVE_RING = None
+            ring.finished.set()
+    if outdata.shape[1] > 1:
+        outdata[:, 1:] = outdata[:, :1]
+
+def _get_stream():
+    """Returns the shared output stream, (re)opening and starting it if needed."""
+    global _STREAM
+    if _STREAM is not None and not _STREAM.closed and _STREAM.active:
+        return _STREAM
+    if _STREAM is not None: # The stream stopped (e.g. after a device error): re-query the device
+        invalidate_output_device()
+    _close_stream()
+    try:
+        device_info = get_output_device()
+        channels = max(1, device_info['max_output_channels'])
+    except Exception as dev_e:
+        logger.warning("Failed to query output device info: %s. Defaulting to mono output.", dev_e)
+        device_info = None
+        channels = 1
+    blocksize = _stream_blocksize(device_info)
+    stream = sd.OutputStream(
+        samplerate=OPENAI_TTS_SAMPLERATE,
+        channels=channels,
+        dtype='int16', # OpenAI's native sample format; PortAudio converts for the device
+        callback=_stream_callback,
+        blocksize=blocksize,
+        latency='low')
+    stream.start()
+    logger.debug("    [TTS] Opened persistent output stream (%d Hz, %d ch, %d-frame blocks).",
+                 OPENAI_TTS_SAMPLERATE, channels, blocksize)
+    _STREAM = stream
+    return stream
+
+def _close_stream(drain: bool = False):
+    """
+    Closes the shared output stream, if open. With drain=True the stream is
+    stopped first, which waits for buffers already handed to PortAudio to
+    play out; close() alone discards them and cuts off the end of the last line.
+    """
+    global _STREAM
+    stream, _STREAM = _STREAM, None
+    if stream is not None:
+        try:
+            if drain and stream.active:
+                stream.stop()
+            stream.close()
+        except Exception as close_e:
+            logger.debug("Error closing output stream: %s", close_e)
+
+atexit.register(_close_stream, drain=True)
+
+def _to_stream_format(audio_data: np.ndarray, samplerate: int) -> np.ndarray:
+    """
+    Converts decoded int16 audio to the shared stream's format: mono int16 at OPENAI_TTS_SAMPLERATE.
+    OpenAI audio already is; other rates are linearly resampled rather than opening another stream.
+    """
+    if audio_data.ndim > 1:
+        audio_data = audio_data.mean(axis=1, dtype=np.float32)
+    if samplerate != OPENAI_TTS_SAMPLERATE and len(audio_data):
+        n_out = int(round(len(audio_data) * OPENAI_TTS_SAMPLERATE / samplerate))
+        positions = np.arange(n_out, dtype=np.float64) * (samplerate / OPENAI_TTS_SAMPLERATE)
+        audio_data = np.interp(positions, np.arange(len(audio_data)), audio_data)
+    if audio_data.dtype != np.int16:
+        audio_data = np.rint(audio_data).astype(np.int16)
+    return audio_data
+
+def _play_ring(ring: _RingBuffer, producer: threading.Thread | None = None) -> bool:
+    """
+    Plays ring on the shared output stream and blocks until it has been drained.
+    producer, if given, is the thread filling the ring; it is waited for first, and released
+    (by closing the ring) if the stream stops meanwhile.
+    Returns True if the ring played to the end. The caller must hold _PLAYBACK_LOCK.
+    """
+    global _ACTIVE_RING
+    stream = _get_stream()
+    _ACTIVE_RING = ring
+    try:
+        if producer is not None:
+            while producer.is_alive():
+                producer.join(0.1)
+                if not stream.active:
+                    ring.closed = True # Playback stopped, release the producer
+            if ring.closed: # Stream stopped, or the producer gave up on a stalled callback
+                logger.warning("Playback stopped before the audio finished downloading.")
+                return False
+        remaining_seconds = (ring.write_idx - ring.read_idx) / OPENAI_TTS_SAMPLERATE
+        finished = ring.finished.wait(timeout=remaining_seconds + 5.0) # Timeout is only a safety net
+        if not finished:
+            logger.warning("Playback finished event timed out. Stream might not have completed naturally.")
+        return finished
+    finally:
+        if _ACTIVE_RING is ring:
+            _ACTIVE_RING = None
+        ring.closed = True # Release the producer if playback ended early
+
+def _prepare_request(headers: dict, body: bytes):
+    """Builds the API request once, for whichever HTTP client is in use."""
+    if _CLIENT is not None:
+        return _CLIENT.build_request('POST', OPENAI_API_URL, headers=headers, content=body)
+    return _SESSION.prepare_request(requests.Request('POST', OPENAI_API_URL, data=body, headers=headers))
+
+@contextlib.contextmanager
+def _send_request(request, chunk_size: int):
+    """
+    Sends a request from _prepare_request and yields an iterator over the response
+    body chunks. Error statuses raise one of _REQUEST_ERRORS.
+    """
+    if _CLIENT is not None:
+        response = _CLIENT.send(request, stream=True)
+        try:
+            if response.is_error:
+                response.read() # Load the error body for _report_request_error
+            response.raise_for_status()
+            yield response.iter_bytes(chunk_size)
+        finally:
+            response.close()
+    else:
+        with _SESSION.send(request, stream=True, timeout=OPENAI_REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            yield response.iter_content(chunk_size=chunk_size)
+
+def _download(request) -> bytes:
+    """Sends a request from _prepare_request and returns the whole response body."""
+    with _send_request(request, 4096) as chunks:
+        return b"".join(chunks)
+
+def _report_request_error(e: Exception):
+    """Logs an OpenAI API request error, including the response body if there is one."""
+    logger.error("Error during OpenAI TTS API request: %s", e)
+    response = getattr(e, 'response', None) # Only HTTP status errors carry a response
+    if response is not None:
+        try:
+            body = json_loads(response.content)
+        except ValueError: # Invalid JSON (both json and orjson decode errors are ValueErrors)
+            body = response.text
+        logger.error("    Status Code: %s, Response Body: %s", response.status_code, body)
+
+def _stream_and_play(request, cache_key: str) -> bool:
+    """
+    Downloads a 'pcm' response (raw 24 kHz, 16-bit, mono) on a background thread and
+    writes it into a ring buffer drained by the audio callback, so playback starts with
+    the first chunk instead of after the whole download. A complete download is stored
+    in the response cache under cache_key.
+    Returns True if audio was received and played to the end.
+    """
+    ring = _RingBuffer(OPENAI_TTS_SAMPLERATE * RING_BUFFER_SECONDS)
+    producer_errors = []
+    t_tts_api_start = time.perf_counter()
+
+    def _producer():
+        leftover = b"" # Odd trailing byte of a chunk, completed by the next one
+        t_first_byte = None
+        received = [] # Raw response chunks, kept for the response cache
+        try:
+            with _send_request(request, STREAM_CHUNK_BYTES) as chunks:
+                for chunk in chunks:
+                    if t_first_byte is None:
+                        t_first_byte = time.perf_counter()
+                        logger.debug("    [Time] OpenAI TTS API First Byte: %.3f seconds", t_first_byte - t_tts_api_start)
+                    received.append(chunk)
+                    if leftover:
+                        chunk = leftover + chunk
+                    usable = len(chunk) - (len(chunk) % 2)
+                    leftover = chunk[usable:]
+                    if not usable:
+                        continue
+                    samples = np.frombuffer(chunk, dtype=np.int16, count=usable // 2)
+                    if not ring.write(samples):
+                        break # Playback stopped, no point downloading the rest
+                else:
+                    _cache_store(cache_key, b"".join(received))
+            logger.debug("    [Time] OpenAI TTS API Download Duration: %.3f seconds", time.perf_counter() - t_tts_api_start)
+        except Exception as e:
+            producer_errors.append(e)
+        finally:
+            ring.eof = True
+
+    producer_thread = threading.Thread(target=_producer, daemon=True)
+
+    played_successfully = False
+    with _PLAYBACK_LOCK:
+        producer_thread.start()
+        try:
+            logger.debug("    [TTS] Starting streaming playback (%d Hz)...", OPENAI_TTS_SAMPLERATE)
+            finished = _play_ring(ring, producer=producer_thread)
+            logger.debug("    [Time] Audio Playback Duration (Wall Time, incl. download): %.3f seconds",
+                         time.perf_counter() - t_tts_api_start)
+            played_successfully = finished and ring.write_idx > 0
+        except Exception as e:
+            logger.error("Error during streaming playback: %s: %s", type(e).__name__, e)
+            logger.debug("Streaming playback traceback:", exc_info=True)
+            _close_stream() # Reopen on the next utterance
+            if isinstance(e, sd.PortAudioError):
+                invalidate_output_device()
+        finally:
+            ring.closed = True # Release the producer if playback failed to start
+            producer_thread.join()
+
+    if producer_errors:
+        error = producer_errors[0]
+        if isinstance(error, _REQUEST_ERRORS):
+            _report_request_error(error)
+        else:
+            logger.error("An unexpected error occurred while streaming OpenAI TTS audio: %s: %s", type(error).__name__, error)
+            logger.debug("Streaming download traceback:", exc_info=error)
         return False
-    if not text or not text.strip():
-        print("No dialogue text provided to synthesize.")
+    if ring.write_idx == 0:
+        logger.error("Received no audio content from OpenAI.")
         return False
-    if voice_id not in ['alloy', 'echo', 'fable', 'onyx', 'nova', 'shimmer']:
-        print(f"Warning: Unknown OpenAI voice_id '{voice_id}'. Using 'alloy' as default.")
-        voice_id = 'alloy'
+    return played_successfully
 
-    print(f"\nSending dialogue to OpenAI TTS using Voice ID {voice_id}: '{text}'")
-    if instructions and instructions.strip():
-        instr_snippet = (instructions[:70] + '...') if len(instructions) > 70 else instructions
-        print(f"  -> Using Persona Instructions: '{instr_snippet}'")
+# --- Saving ---
 
+SAVE_TIMEOUT_SECONDS = 5.0 # How long to wait for the file write after playback
 
-    headers = {
-        "Authorization": f"Bearer {OPENAI_API_KEY}",
-        "Content-Type": "application/json",
-    }
-    
-    # Requesting a raw WAV format is most reliable for direct playback with sounddevice/soundfile.
-    response_format = "wav" if SOUND_LIBS_AVAILABLE else getattr(config, 'OPENAI_TTS_DEFAULT_FORMAT', 'mp3')
+# Background workers for file writes and cache stores, overlapped with playback
+_io_pool = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="openai-tts-io")
+
+def _write_bytes(filename: str, data: bytes) -> bool:
+    """Writes the audio bytes to filename. Returns True on success."""
+    try:
+        with open(filename, "wb") as out:
+            out.write(data)
+        logger.info("Audio saved to: %s", filename)
+        return True
+    except Exception as e:
+        logger.error("Error saving OpenAI TTS audio file '%s': %s", filename, e)
+        return False
+
+# Response formats to request when saving, by file extension
+_SAVE_FORMATS = {
+    '.mp3': 'mp3', '.wav': 'wav', '.flac': 'flac', '.opus': 'opus', '.aac': 'aac',
+    '.pcm': 'pcm', '.raw': 'pcm',
+}
+
+def _save_format(output_filename: str) -> str:
+    """Picks the response format matching the file extension, or the configured default."""
+    ext = os.path.splitext(output_filename)[1].lower()
+    return _SAVE_FORMATS.get(ext) or getattr(config, 'OPENAI_TTS_DEFAULT_FORMAT', 'mp3')
+
+# --- Request Body ---
+
+_REQUEST_HEADERS = {"Content-Type": "application/json"} # Authorization is set on the shared clients/session
+
+def _request_body(
+    text: str,
+    voice_id: str,
+    output_filename: str | None,
+    instructions: str | None
+    ) -> tuple[bytes, str, str]:
+    """
+    Serializes the API request for a line. Returns (body, model, response_format).
+    The body is posted as raw bytes with the JSON Content-Type header, and is also the cache key source.
+    """
+    if voice_id not in _VALID_VOICES:
+        voice_id = 'alloy'
+
+    # Playback without saving streams raw PCM, which needs no decoding at all.
+    # When saving, the file extension picks the format so the saved file is what was asked for;
+    # playback then decodes that format (or uses it as-is for '.pcm'/'.raw').
+    if output_filename:
+        response_format = _save_format(output_filename)
+    else:
+        response_format = "pcm"
     model = getattr(config, 'OPENAI_TTS_MODEL', 'tts-1-hd')
 
     payload = {
@@ -78,113 +586,267 @@ def synthesize(
         payload["instructions"] = instructions.strip()
     # <<< END OF RESTORED LOGIC >>>
 
+    return json_dumps(payload, indent=False), model, response_format
 
-    audio_content = None
+# --- Standardized Functions ---
+
+def synthesize(
+    text: str,
+    voice_id: str,
+    output_filename: str | None = None,
+    instructions: str | None = None
+    ) -> bool:
+    """
+    Synthesizes text using OpenAI TTS, optionally using persona instructions with
+    compatible models (e.g., gpt-4o-mini-tts). Playback-only calls stream raw PCM into
+    the audio device as it downloads; when saving to a file, the robust
+    "Download-Then-Play" model is used, requesting the format named by the file's
+    extension (see _SAVE_FORMATS).
+    Returns True on success, False on failure.
+    """
+    if not OPENAI_API_KEY:
+        logger.error("OpenAI API Key not configured. Cannot synthesize.")
+        return False
+    if not text or not text.strip():
+        logger.warning("No dialogue text provided to synthesize.")
+        return False
+    if voice_id not in _VALID_VOICES:
+        logger.warning("Unknown OpenAI voice_id '%s'. Using 'alloy' as default.", voice_id)
+        voice_id = 'alloy'
+
+    logger.info("Sending dialogue to OpenAI TTS using Voice ID %s: '%s'", voice_id, text)
+    if instructions and instructions.strip():
+        instr_snippet = (instructions[:70] + '...') if len(instructions) > 70 else instructions
+        logger.info("  -> Using Persona Instructions: '%s'", instr_snippet)
+
+
+    stream_playback = SOUND_LIBS_AVAILABLE and not output_filename
+    body, model, response_format = _request_body(text, voice_id, output_filename, instructions)
+    request = _prepare_request(_REQUEST_HEADERS, body)
+    cache_key = _cache_key(body)
+    cached_audio = _cache_load(cache_key)
+
+    if stream_playback and cached_audio is None:
+        logger.debug("    [TTS] Requesting synthesis from OpenAI API (Model: %s, Format: %s, streaming)...", model, response_format)
+        try:
+            return _stream_and_play(request, cache_key)
+        except Exception as e:
+            logger.error("OpenAI TTS request failed: %s: %s", type(e).__name__, e)
+            logger.debug("OpenAI TTS traceback:", exc_info=True)
+            return False
+
+    audio_content = cached_audio
     try:
-        # --- API Call (Stream Download to Memory) ---
+        # --- API Call (Stream Download to Memory), unless the response is cached ---
         t_tts_api_start = time.perf_counter()
-        print(f"    [TTS] Requesting synthesis from OpenAI API (Model: {model}, Format: {response_format})...")
+        if audio_content is not None:
+            logger.debug("    [TTS] Using cached OpenAI TTS audio (Format: %s).", response_format)
+        else:
+            logger.debug("    [TTS] Requesting synthesis from OpenAI API (Model: %s, Format: %s)...", model, response_format)
 
-        with requests.post(OPENAI_API_URL, headers=headers, json=payload, stream=True) as response:
-            response.raise_for_status()
-            
-            audio_buffer = io.BytesIO()
-            for chunk in response.iter_content(chunk_size=4096):
-                audio_buffer.write(chunk)
-            
-            audio_buffer.seek(0)
-            audio_content = audio_buffer.read()
+            audio_content = _download(request)
 
         t_tts_api_end = time.perf_counter()
         api_duration = t_tts_api_end - t_tts_api_start
-        print(f"    [Time] OpenAI TTS API Download Duration: {api_duration:.3f} seconds")
+        logger.debug("    [Time] OpenAI TTS API Download Duration: %.3f seconds", api_duration)
 
         if not audio_content:
-            print("Error: Received no audio content from OpenAI.")
+            logger.error("Received no audio content from OpenAI.")
             return False
 
+        # --- Saving and caching (in the background, overlapped with playback) ---
+        save_future = None
+        if output_filename:
+            try:
+                output_dir = os.path.dirname(output_filename)
+                if output_dir and not os.path.exists(output_dir):
+                     os.makedirs(output_dir, exist_ok=True)
+                save_future = _io_pool.submit(_write_bytes, output_filename, audio_content)
+            except Exception as e:
+                logger.error("Error saving OpenAI TTS audio file '%s': %s", output_filename, e)
+        if cached_audio is None:
+            _io_pool.submit(_cache_store, cache_key, audio_content)
+
         # --- Playback Implementation ---
         played_successfully = False
         if SOUND_LIBS_AVAILABLE:
             try:
-                audio_data, samplerate = sf.read(io.BytesIO(audio_content), dtype='float32')
+                if response_format == "pcm": # Raw 24 kHz, 16-bit, mono: no container or codec to decode
+                    audio_data = np.frombuffer(audio_content, dtype=np.int16, count=len(audio_content) // 2)
+                    samplerate = OPENAI_TTS_SAMPLERATE
+                elif response_format == "mp3" and MINIAUDIO_AVAILABLE:
+                    decoded = miniaudio.decode(
+                        audio_content,
+                        output_format=miniaudio.SampleFormat.SIGNED16,
+                        nchannels=1,
+                        sample_rate=OPENAI_TTS_SAMPLERATE)
+                    audio_data = np.frombuffer(decoded.samples, dtype=np.int16)
+                    samplerate = decoded.sample_rate
+                else:
+                    audio_data, samplerate = sf.read(io.BytesIO(audio_content), dtype='int16')
                 
-                print(f"    [TTS] Starting playback ({samplerate} Hz, {audio_data.shape[1] if audio_data.ndim > 1 else 1} ch)...")
-                sd.play(audio_data, samplerate, blocking=True)
+                logger.debug("    [TTS] Starting playback (%d Hz, %d ch)...",
+                             samplerate, audio_data.shape[1] if audio_data.ndim > 1 else 1)
+                # Feed the shared stream instead of opening a new one for this utterance
+                audio_data = _to_stream_format(audio_data, samplerate)
+                ring = _RingBuffer(len(audio_data))
+                ring.write(audio_data)
+                ring.eof = True
+                with _PLAYBACK_LOCK:
+                    played_successfully = _play_ring(ring)
                 
                 t_playback_end = time.perf_counter()
                 playback_duration = t_playback_end - t_tts_api_end
-                print(f"    [Time] Audio Playback Duration (Wall Time): {playback_duration:.3f} seconds")
-                played_successfully = True
+                logger.debug("    [Time] Audio Playback Duration (Wall Time): %.3f seconds", playback_duration)
 
             except Exception as e:
-                print(f"Error during audio playback: {type(e).__name__}: {e}")
-                traceback.print_exc()
+                logger.error("Error during audio playback: %s: %s", type(e).__name__, e)
+                logger.debug("Audio playback traceback:", exc_info=True)
+                _close_stream() # Reopen on the next utterance
+                if isinstance(e, sd.PortAudioError):
+                    invalidate_output_device()
         else:
-            print("Audio playback skipped (sounddevice/soundfile not available).")
+            logger.info("Audio playback skipped (sounddevice/soundfile not available).")
 
-        # --- Saving ---
         saved_successfully = False
-        if output_filename:
+        if save_future is not None:
             try:
-                output_dir = os.path.dirname(output_filename)
-                if output_dir and not os.path.exists(output_dir):
-                     os.makedirs(output_dir, exist_ok=True)
-                
-                with open(output_filename, "wb") as out:
-                    out.write(audio_content)
-                print(f"Audio saved to: {output_filename}")
-                saved_successfully = True
-            except Exception as e:
-                print(f"Error saving OpenAI TTS audio file '{output_filename}': {e}")
-        
+                saved_successfully = save_future.result(timeout=SAVE_TIMEOUT_SECONDS)
+            except concurrent.futures.TimeoutError:
+                logger.error("Timed out saving OpenAI TTS audio file '%s'.", output_filename)
+
         return saved_successfully or (played_successfully and not output_filename)
 
     # --- Error Handling ---
-    except requests.exceptions.RequestException as e:
-        print(f"Error during OpenAI TTS API request: {e}")
-        if e.response is not None:
-            print(f"    Status Code: {e.response.status_code}")
-            try:
-                print(f"    Response Body: {e.response.json()}")
-            except requests.exceptions.JSONDecodeError:
-                print(f"    Response Body (non-JSON): {e.response.text}")
+    except _REQUEST_ERRORS as e:
+        _report_request_error(e)
         return False
     except Exception as e:
-        print(f"An unexpected error occurred in synthesize function: {type(e).__name__}: {e}")
-        traceback.print_exc()
+        logger.error("OpenAI TTS request failed: %s: %s", type(e).__name__, e)
+        logger.debug("OpenAI TTS traceback:", exc_info=True)
         return False
 
 
-def get_voices() -> dict:
+# --- Async / Batch Synthesis ---
+
+BATCH_MAX_CONCURRENCY = 4 # Requests a batch keeps in flight at once
+
+def _async_client():
     """
-    Returns available OpenAI voices in the standardized format.
-    NOTE: OpenAI voices are fixed and do not have official gender classifications.
-          Genders assigned here ('male'/'female') are based on common perception.
+    Returns a new async HTTP/2 client, or None without httpx (requests then run on the
+    shared session in worker threads). An AsyncClient is bound to the event loop it was
+    first used on, so each synthesize_async()/synthesize_batch() call opens its own.
     """
-    print("Fetching available voices from OpenAI TTS (hardcoded list)...")
+    if _CLIENT is None:
+        return None
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=httpx.Timeout(OPENAI_REQUEST_TIMEOUT[1], connect=OPENAI_REQUEST_TIMEOUT[0]),
+        limits=httpx.Limits(max_connections=BATCH_MAX_CONCURRENCY),
+        headers={"Authorization": f"Bearer {OPENAI_API_KEY}"})
 
-    voices = {
-        'alloy': 'male', 'echo': 'male', 'fable': 'male', 'onyx': 'male', 
-        'nova': 'female', 'shimmer': 'female'
-    }
+async def _prefetch_async(body: bytes, client, semaphore: asyncio.Semaphore) -> bool:
+    """Downloads the response for a request body into the response cache, unless it is already cached."""
+    cache_key = _cache_key(body)
+    if await asyncio.to_thread(_cache_load, cache_key) is not None:
+        return True
+    try:
+        async with semaphore:
+            if client is not None:
+                response = await client.post(OPENAI_API_URL, headers=_REQUEST_HEADERS, content=body)
+                response.raise_for_status()
+                audio_content = response.content
+            else:
+                audio_content = await asyncio.to_thread(_download, _prepare_request(_REQUEST_HEADERS, body))
+    except _REQUEST_ERRORS as e:
+        _report_request_error(e)
+        return False
+    if not audio_content:
+        logger.error("Received no audio content from OpenAI.")
+        return False
+    await asyncio.to_thread(_cache_store, cache_key, audio_content)
+    return True
 
-    male_voices = []
-    female_voices = []
+async def synthesize_async(
+    text: str,
+    voice_id: str,
+    output_filename: str | None = None,
+    instructions: str | None = None
+    ) -> bool:
+    """
+    Async variant of synthesize(). The audio is fetched with the async HTTP/2 client,
+    then played/saved by synthesize() in a worker thread from the response cache.
+    Returns True on success, False on failure.
+    """
+    if OPENAI_API_KEY and text and text.strip():
+        body, _, _ = _request_body(text, voice_id, output_filename, instructions)
+        client = _async_client()
+        try:
+            await _prefetch_async(body, client, asyncio.Semaphore(1)) # On failure synthesize() retries and reports the error
+        finally:
+            if client is not None:
+                await client.aclose()
+    return await asyncio.to_thread(synthesize, text, voice_id, output_filename, instructions)
 
-    for voice_id, perceived_gender in voices.items():
-        voice_name = voice_id.capitalize()
-        voice_data = {"id": voice_id, "name": voice_name}
-        if perceived_gender == "male":
-            male_voices.append(voice_data)
-        elif perceived_gender == "female":
-            female_voices.append(voice_data)
+async def synthesize_batch(items) -> list[bool]:
+    """
+    Synthesizes several lines, given as (text, voice_id, output_filename, instructions) tuples
+    (trailing items optional). Up to BATCH_MAX_CONCURRENCY requests are sent concurrently, so
+    the batch costs a few round trips instead of one per line; the lines are then played/saved in order.
+    Returns one success flag per item.
+    """
+    items = [tuple(item) + (None,) * (4 - len(item)) for item in items]
+    if OPENAI_API_KEY:
+        client = _async_client()
+        semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+        try:
+            await asyncio.gather(*(
+                _prefetch_async(_request_body(text, voice_id, output_filename, instructions)[0], client, semaphore)
+                for text, voice_id, output_filename, instructions in items
+                if text and text.strip()))
+        finally:
+            if client is not None:
+                await client.aclose()
+    results = []
+    for text, voice_id, output_filename, instructions in items:
+        results.append(await asyncio.to_thread(synthesize, text, voice_id, output_filename, instructions))
+    return results
+
+
+# OpenAI voices are fixed and do not have official gender classifications.
+# Genders assigned here ('male'/'female') are based on common perception.
+# 'ash', 'coral' and 'sage' are newer voices available on every model (tts-1, tts-1-hd, gpt-4o-mini-tts);
+# 'ballad' and 'verse' are only accepted by gpt-4o-mini-tts, so they are dropped for tts-1* models.
+_VOICES = {
+    'alloy': 'male', 'ash': 'male', 'ballad': 'male', 'echo': 'male',
+    'fable': 'male', 'onyx': 'male', 'verse': 'male',
+    'coral': 'female', 'nova': 'female', 'sage': 'female', 'shimmer': 'female'
+}
+_MINI_TTS_ONLY_VOICES = frozenset({'ballad', 'verse'})
+if not getattr(config, 'OPENAI_TTS_MODEL', 'tts-1-hd').startswith('gpt-4o-mini-tts'):
+    _VOICES = {v: g for v, g in _VOICES.items() if v not in _MINI_TTS_ONLY_VOICES}
+# Voice ids accepted by synthesize() for the configured model, derived from the table above.
+# Characters mapped to a dropped voice under another model fall back to 'alloy'.
+_VALID_VOICES = frozenset(_VOICES)
 
-    print(f"Found {len(male_voices)} perceived male voices and {len(female_voices)} perceived female voices.")
-    return {"male": male_voices, "female": female_voices}
+# The listing is static, so it is built once at import; get_voices() hands out copies of these lists.
+_MALE_VOICES = [{"id": v, "name": v.capitalize()} for v, g in _VOICES.items() if g == "male"]
+_FEMALE_VOICES = [{"id": v, "name": v.capitalize()} for v, g in _VOICES.items() if g == "female"]
+
+def get_voices() -> dict:
+    """
+    Returns available OpenAI voices in the standardized format.
+    The listing is built once at import; each call gets fresh lists (the voice dicts are shared).
+    NOTE: OpenAI voices are fixed and do not have official gender classifications.
+          Genders assigned here ('male'/'female') are based on common perception.
+    """
+    logger.debug("OpenAI TTS: %d perceived male voices and %d perceived female voices available (hardcoded list).",
+                 len(_MALE_VOICES), len(_FEMALE_VOICES))
+    return {"male": list(_MALE_VOICES), "female": list(_FEMALE_VOICES)}
 
 # --- Example Usage (Optional) ---
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s") # Show per-call timings and tracebacks
     print("\n--- OpenAI TTS Module Test ---")
 
     if not OPENAI_API_KEY:
@@ -1,16 +1,92 @@
+import functools
+import json
+import logging
 import re
 
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Compiled once at import; clean_gemini_response runs on every Gemini reply
+_JSON_BLOCK_RE = re.compile(r"```(?:json)?\s*({.*?})\s*```", re.DOTALL | re.IGNORECASE)
+_BRACE_RE = re.compile(r"({.*?})", re.DOTALL)
+
 def clean_gemini_response(text: str) -> str:
     """Removes potential markdown formatting around JSON."""
     # Look for ```json ... ``` block
-    match = re.search(r"```(?:json)?\s*({.*?})\s*```", text, re.DOTALL | re.IGNORECASE)
+    match = _JSON_BLOCK_RE.search(text)
     if match:
         return match.group(1).strip()
     # Look for any {...} block as a fallback
-    match = re.search(r"({.*?})", text, re.DOTALL)
+    match = _BRACE_RE.search(text)
     if match:
         return match.group(1).strip()
     # Return stripped text if no JSON block found (might be just the JSON)
     return text.strip()
 
+# --- JSON ---
+
+# Optional: C-accelerated JSON (requires orjson). Both parsers raise json.JSONDecodeError subclasses.
+# Shared by the modules that read/write JSON; indent=False gives compact bytes (e.g. request bodies).
+try:
+    import orjson
+
+    def json_dumps(obj, indent: bool = True) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None)
+
+    def json_loads(data):
+        return orjson.loads(data)
+
+    JSON_LOADS_BUFFERS = True # orjson parses a memoryview in place
+except ImportError:
+    def json_dumps(obj, indent: bool = True) -> bytes:
+        if indent:
+            return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def json_loads(data):
+        return json.loads(data)
+
+    JSON_LOADS_BUFFERS = False
+
+# --- Audio Helpers ---
+
+@functools.lru_cache(maxsize=8)
+def fade_in_curve(samplerate: int, fade_ms: int, dtype_str: str) -> np.ndarray:
+    """
+    Returns a quadratic fade-in curve for the given sample rate and duration.
+    The curve is cached and shared between calls, so it is marked read-only.
+    """
+    n_samples = int(samplerate * fade_ms / 1000)
+    curve = np.linspace(0.0, 1.0, n_samples, dtype=np.dtype(dtype_str))
+    curve *= curve
+    curve.flags.writeable = False
+    return curve
+
+# --- Audio Output Device ---
+# Shared by the TTS modules that play through sounddevice; callers check their own
+# SOUND_LIBS_AVAILABLE flag before calling, so sounddevice is imported on first use.
+
+_cached_output_device = None # Default output device info, queried on first playback
+
+def get_output_device() -> dict:
+    """
+    Returns the default output device info. Querying PortAudio devices is slow, so the
+    result is cached until invalidate_output_device() is called after a PortAudio error.
+    Query errors propagate and are not cached.
+    """
+    global _cached_output_device
+    if _cached_output_device is None:
+        import sounddevice as sd
+        device_info = sd.query_devices(kind='output')
+        device_name, max_channels = device_info['name'], device_info['max_output_channels']
+        logger.debug("    [SoundDevice] Using output device: %s with %d channels.", device_name, max_channels)
+        _cached_output_device = device_info
+    return _cached_output_device
+
+def invalidate_output_device():
+    """Forgets the cached output device, so the next playback queries it again."""
+    global _cached_output_device
+    _cached_output_device = None
+
 # Add any other general utility functions here if needed
\ No newline at end of file
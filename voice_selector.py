@@ -1,42 +1,128 @@
 import os
 import json
+import logging
+import collections
+import importlib
+import mmap
 import random
+import sys
+import threading
 import time
 from typing import Dict, List, Tuple, Optional, Union # ADDED Union to import list
 
-# Import the correct TTS module's get_voices function based on config
-try:
-    if os.path.exists('config.py'): # Basic check if config exists
-        import config # Import config to read TTS_PROVIDER
-        if config.TTS_PROVIDER == 'elevenlabs':
-            from tts_elevenlabs import get_voices
-            DEFAULT_FALLBACK = config.DEFAULT_FALLBACK_VOICE_ID
-        elif config.TTS_PROVIDER == 'google':
-            from tts_google import get_voices
-            DEFAULT_FALLBACK = config.DEFAULT_FALLBACK_VOICE_ID
-        elif config.TTS_PROVIDER == 'openai':
-            from tts_openai import get_voices
-            DEFAULT_FALLBACK = config.DEFAULT_FALLBACK_VOICE_ID
-        elif config.TTS_PROVIDER == 'gemini_tts': # ADDED: Gemini TTS provider case
-            from tts_gemini import get_voices
-            DEFAULT_FALLBACK = config.DEFAULT_FALLBACK_VOICE_ID # This will get the "Kore" default if not set in .env
+from utils import json_dumps, json_loads, JSON_LOADS_BUFFERS
+
+logger = logging.getLogger(__name__) # Per-dialogue-line messages; debug output is off unless configured
+
+# The TTS provider module is imported on first use rather than at import time, since it pulls
+# in the provider's SDK and is only needed when the voice cache has to be (re)fetched.
+_PROVIDER_MODULES = {
+    'elevenlabs': 'tts_elevenlabs',
+    'google': 'tts_google',
+    'openai': 'tts_openai',
+    'gemini_tts': 'tts_gemini',
+}
+
+_get_voices_fn = None # Resolved provider get_voices function, set by _resolve_provider()
+
+def _no_voices() -> Dict[str, List[Dict[str, str]]]:
+    return {'male': [], 'female': []} # Dummy get_voices when no provider can be loaded
+
+def _load_config():
+    """Returns the config module, or None if config.py does not exist."""
+    if not os.path.exists('config.py'): # Basic check if config exists
+        return None
+    import config
+    return config
+
+def _resolve_provider():
+    """Imports the configured TTS module on first call and returns its get_voices function."""
+    global _get_voices_fn
+    if _get_voices_fn is not None:
+        return _get_voices_fn
+    try:
+        config = _load_config()
+        if config is None:
+            print("Warning [VoiceSelector]: config.py not found. Cannot determine TTS provider or load voices.")
+            _get_voices_fn = _no_voices
+        elif config.TTS_PROVIDER in _PROVIDER_MODULES:
+            module = importlib.import_module(_PROVIDER_MODULES[config.TTS_PROVIDER])
+            _get_voices_fn = module.get_voices
         else:
             print(f"Warning [VoiceSelector]: Unknown TTS_PROVIDER '{config.TTS_PROVIDER}' in config. Cannot load specific voices.")
-            get_voices = lambda: {'male': [], 'female': []} # Dummy function
-            DEFAULT_FALLBACK = ""
-    else:
-        print("Warning [VoiceSelector]: config.py not found. Cannot determine TTS provider or load voices.")
-        get_voices = lambda: {'male': [], 'female': []} # Dummy function
-        DEFAULT_FALLBACK = ""
-
-except ImportError as e:
-    print(f"Warning [VoiceSelector]: Failed to import TTS module or get_voices function: {e}. Voice selection might be limited.")
-    get_voices = lambda: {'male': [], 'female': []} # Dummy function
-    DEFAULT_FALLBACK = "" # No fallback if import fails
-except Exception as e:
-    print(f"Warning [VoiceSelector]: An unexpected error occurred during TTS module import: {e}")
-    get_voices = lambda: {'male': [], 'female': []} # Dummy function
-    DEFAULT_FALLBACK = ""
+            _get_voices_fn = _no_voices
+    except ImportError as e:
+        print(f"Warning [VoiceSelector]: Failed to import TTS module or get_voices function: {e}. Voice selection might be limited.")
+        _get_voices_fn = _no_voices
+    except Exception as e:
+        print(f"Warning [VoiceSelector]: An unexpected error occurred during TTS module import: {e}")
+        _get_voices_fn = _no_voices
+    return _get_voices_fn
+
+def get_voices() -> Dict[str, List[Dict[str, str]]]:
+    """Returns the configured TTS provider's voices, importing the provider module on first use."""
+    return _resolve_provider()()
+
+def _default_fallback() -> str:
+    """Returns the configured fallback voice id, or "" if none is available."""
+    try:
+        config = _load_config()
+    except Exception:
+        return ""
+    if config is None or config.TTS_PROVIDER not in _PROVIDER_MODULES:
+        return ""
+    return config.DEFAULT_FALLBACK_VOICE_ID or "" # For Gemini this is the "Kore" default if not set in .env
+
+# save_map() rewrites the whole map, so unforced saves are batched: they only write once this
+# many characters were added, or this long after the last save. flush() writes the rest.
+SAVE_EVERY_N_CHANGES = 16
+SAVE_INTERVAL_SECONDS = 30.0
+
+# A voice cache older than this is still used, but refreshed in the background for the next start
+VOICE_CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+def _write_json_atomic(path: str, data) -> None:
+    """
+    Serializes data up front and writes it in one go to a temp file that then replaces path,
+    so a crash mid-write never leaves a torn file behind. The directory must exist.
+    Raises OSError on failure.
+    """
+    payload = json_dumps(data)
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def _read_json_mapped(path: str):
+    """
+    Parses a JSON file through a read-only memory map, so orjson reads straight from the
+    OS page cache instead of a copied bytes object. Raises OSError or ValueError on failure.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0: # Empty files can't be mapped
+            return json_loads(b"")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if not JSON_LOADS_BUFFERS:
+                return json_loads(mm.read())
+            view = memoryview(mm)
+            try:
+                return json_loads(view)
+            finally:
+                view.release() # The map can't close while a view is exported
+
+_EMPTY = "" # Persona for characters without instructions; stored and returned as the same object
+
+# Gender labels from the analysis mapped to (primary, secondary) available_voices keys. Other labels
+# ('Unknown') have no primary list and take whichever list is non-empty, male first.
+_GENDER_ORDER = {'Male': ('male', 'female'), 'Female': ('female', 'male')}
+_NO_GENDER_ORDER = ('male', 'female')
 
 class VoiceSelector:
     """Manages voice selection, assignment, and persistence."""
@@ -44,22 +130,43 @@ class VoiceSelector:
     def __init__(self, voices_path: str, mapping_path: str):
         self.voices_path = voices_path
         self.mapping_path = mapping_path
+        # Ensure the cache/map directories exist once, rather than on every save
+        for directory in {os.path.dirname(voices_path), os.path.dirname(mapping_path)}:
+            if directory:
+                os.makedirs(directory, exist_ok=True)
         # Structure: {'male': [{'id': '...', 'name': '...'}], 'female': [...]}
         self.available_voices: Dict[str, List[Dict[str, str]]] = {'male': [], 'female': []}
         # Structure: {'Character Name': {'voice_id': '...', 'persona_instructions': '...'}}
         self.character_map: Dict[str, Dict[str, str]] = {}
+        # Voice ids used in character_map, kept in step with it so assignment needn't rescan the map
+        self._used_voice_ids: set = set()
+        # Parallel per-gender tuples of voice ids and names, flattened from available_voices, and
+        # shuffled queues of indices into them for unused voices; rebuilt whenever voices or the map are (re)loaded
+        self._voice_ids: Dict[str, Tuple[str, ...]] = {'male': (), 'female': ()}
+        self._voice_names: Dict[str, Tuple[str, ...]] = {'male': (), 'female': ()}
+        self._free_by_gender: Dict[str, collections.deque] = {'male': collections.deque(), 'female': collections.deque()}
         self.needs_saving = False
+        self._dirty_count = 0    # Characters added since the last save
+        self._last_save = None   # time.monotonic() of the last save; None (never saved) lets the first change save right away
+        # Result for the 'Unknown' character: fallback ID (or None if no fallback set) and empty persona.
+        # Built once, as ambient 'Unknown' lines can arrive back to back.
+        self._unknown_result: Tuple[Optional[str], str] = (_default_fallback() or None, _EMPTY)
+        logger.debug("Character name 'Unknown' will use default fallback voice %s and no persona.", self._unknown_result[0])
 
     def load_voices(self, force_refresh: bool = False):
         """Loads available voices from cache or fetches fresh from TTS provider."""
         if not force_refresh and os.path.exists(self.voices_path):
             try:
-                with open(self.voices_path, 'r', encoding='utf-8') as f:
-                    self.available_voices = json.load(f)
+                self.available_voices = _read_json_mapped(self.voices_path)
                 print(f"Loaded {len(self.available_voices.get('male',[]))} male and {len(self.available_voices.get('female',[]))} female voices from cache: {self.voices_path}")
                 if not self.available_voices.get('male') and not self.available_voices.get('female'):
                      print("Warning: Voice cache file is empty or invalid. Forcing refresh.")
                      self._fetch_and_cache_voices() # Force refresh if cache is bad
+                elif time.time() - os.path.getmtime(self.voices_path) > VOICE_CACHE_TTL_SECONDS:
+                     # Stale-while-revalidate: keep the cached list, refresh the file off the startup path
+                     print("Voice cache is stale. Refreshing it in the background for the next start.")
+                     threading.Thread(target=self._background_refresh, daemon=True).start()
+                self._rebuild_free_pools()
                 return
             except (json.JSONDecodeError, IOError) as e:
                 print(f"Error loading voice cache file '{self.voices_path}': {e}. Fetching fresh voices.")
@@ -69,60 +176,117 @@ class VoiceSelector:
             self._fetch_and_cache_voices()
 
     def _fetch_and_cache_voices(self):
-        """Fetches voices using the imported get_voices and caches them."""
+        """Fetches voices from the TTS provider (imported on first use) and caches them."""
         try:
             self.available_voices = get_voices()
-            # Ensure cache directory exists
-            os.makedirs(os.path.dirname(self.voices_path), exist_ok=True)
-            with open(self.voices_path, 'w', encoding='utf-8') as f:
-                json.dump(self.available_voices, f, indent=2)
+            _write_json_atomic(self.voices_path, self.available_voices)
             print(f"Successfully fetched and cached {len(self.available_voices.get('male',[]))} male and {len(self.available_voices.get('female',[]))} female voices to: {self.voices_path}")
         except Exception as e:
             print(f"Error fetching or caching voices: {e}")
             # Keep potentially outdated list or empty list if first time
             if not self.available_voices:
                  self.available_voices = {'male': [], 'female': []}
+        self._rebuild_free_pools()
+
+    def _background_refresh(self):
+        """Fetches voices and rewrites the cache file only; the running session keeps its list."""
+        try:
+            voices = get_voices()
+            if not voices.get('male') and not voices.get('female'):
+                print("Warning: Background voice refresh returned no voices. Keeping the existing cache.")
+                return
+            _write_json_atomic(self.voices_path, voices)
+            print(f"Refreshed voice cache in the background: {self.voices_path}")
+        except Exception as e:
+            print(f"Error refreshing voice cache in the background: {e}")
 
     def load_map(self):
         """Loads the character-to-voice mapping from file."""
         if os.path.exists(self.mapping_path):
             try:
-                with open(self.mapping_path, 'r', encoding='utf-8') as f:
-                    loaded_map = json.load(f)
+                with open(self.mapping_path, 'rb') as f:
+                    loaded_map = json_loads(f.read())
                     # Validate and ensure persona field exists
                     validated_map = {}
                     for name, data in loaded_map.items():
+                        name = sys.intern(name) # Character names recur every line; share one key object
                         if isinstance(data, dict) and 'voice_id' in data:
                              validated_map[name] = {
                                  'voice_id': data['voice_id'],
-                                 'persona_instructions': data.get('persona_instructions', '') # Add default if missing
+                                 'persona_instructions': data.get('persona_instructions') or _EMPTY # Add default if missing
                              }
                         elif isinstance(data, str): # Handle old format maybe?
                              print(f"Warning: Found old map format for '{name}'. Resetting persona.")
-                             validated_map[name] = {'voice_id': data, 'persona_instructions': ''}
+                             validated_map[name] = {'voice_id': data, 'persona_instructions': _EMPTY}
                     self.character_map = validated_map
+                    self._used_voice_ids = {d['voice_id'] for d in validated_map.values() if d.get('voice_id')}
                 print(f"Loaded {len(self.character_map)} character voice mappings from: {self.mapping_path}")
             except (json.JSONDecodeError, IOError) as e:
                 print(f"Error loading character map file '{self.mapping_path}': {e}. Starting with empty map.")
                 self.character_map = {}
+                self._used_voice_ids = set()
         else:
             print("No character map file found. Starting with empty map.")
             self.character_map = {}
+            self._used_voice_ids = set()
+        self._rebuild_free_pools()
 
-    def save_map(self):
-        """Saves the character-to-voice mapping to file if changes were made."""
-        if self.needs_saving:
-            try:
-                # Ensure map directory exists
-                os.makedirs(os.path.dirname(self.mapping_path), exist_ok=True)
-                with open(self.mapping_path, 'w', encoding='utf-8') as f:
-                    json.dump(self.character_map, f, indent=2)
-                print(f"Character voice mapping file saved: {self.mapping_path}")
-                self.needs_saving = False
-            except IOError as e:
-                print(f"Error saving character map file '{self.mapping_path}': {e}")
-        # else:
-        #     print("No changes to character map needed saving.")
+    def _rebuild_free_pools(self):
+        """
+        Flattens available_voices into per-gender id/name tuples and rebuilds the queues
+        of unassigned voice indices, shuffled once here.
+        """
+        used = self._used_voice_ids
+        for g in ('male', 'female'):
+            voices = self.available_voices.get(g) or ()
+            ids = self._voice_ids[g] = tuple(v['id'] for v in voices)
+            self._voice_names[g] = tuple(v['name'] for v in voices)
+            free = [i for i, voice_id in enumerate(ids) if voice_id not in used]
+            random.shuffle(free)
+            self._free_by_gender[g] = collections.deque(free)
+
+    def _next_free_voice(self, gender_key: str) -> Optional[Tuple[str, str]]:
+        """
+        Returns (voice_id, name) of the next unused voice in gender_key's free queue, or None if
+        the queue is empty. The queue was shuffled when built, so this is O(1); voices used since
+        (by commit_voice(), or listed under both genders) are dropped from the front.
+        The returned voice moves to the back of the queue rather than being taken: it is only
+        used once committed, and a proposal that is never committed (e.g. its synthesis failed)
+        must not hand the same voice to every following new character.
+        """
+        pool = self._free_by_gender[gender_key]
+        ids = self._voice_ids[gender_key]
+        while pool:
+            i = pool.popleft()
+            if ids[i] not in self._used_voice_ids:
+                pool.append(i)
+                return ids[i], self._voice_names[gender_key][i]
+        return None
+
+    def save_map(self, force: bool = False):
+        """
+        Saves the character-to-voice mapping to file if changes were made. Unless force is set,
+        the write is deferred until SAVE_EVERY_N_CHANGES characters were added or
+        SAVE_INTERVAL_SECONDS have passed since the last save.
+        """
+        if not self.needs_saving:
+            # print("No changes to character map needed saving.")
+            return
+        if not force and self._dirty_count < SAVE_EVERY_N_CHANGES \
+                and self._last_save is not None and time.monotonic() - self._last_save < SAVE_INTERVAL_SECONDS:
+            return
+        try:
+            _write_json_atomic(self.mapping_path, self.character_map)
+            print(f"Character voice mapping file saved: {self.mapping_path}")
+            self.needs_saving = False
+            self._dirty_count = 0
+            self._last_save = time.monotonic()
+        except IOError as e:
+            print(f"Error saving character map file '{self.mapping_path}': {e}")
+
+    def flush(self):
+        """Writes any deferred changes to the mapping file. Call before exiting."""
+        self.save_map(force=True)
 
 
     def load_data(self, force_refresh_voices: bool = False):
@@ -130,10 +294,22 @@ class VoiceSelector:
          self.load_voices(force_refresh=force_refresh_voices)
          self.load_map()
 
+    def get_voice(self, character_name: str) -> Optional[Tuple[str, str]]:
+        """
+        Returns (voice_id, persona_instructions) for an already mapped character, or None.
+        Never assigns; use find_or_assign_voice() for new characters. "Unknown" is never
+        mapped, so callers can pass any parsed name and fall back to propose_voice().
+        """
+        existing = self.character_map.get(character_name) if character_name != "Unknown" else None
+        if existing is None:
+            return None
+        return existing['voice_id'], existing['persona_instructions']
+
     def find_or_assign_voice(self, character_name: str, gender: str, new_persona_instructions: str = "") -> Tuple[Optional[str], Optional[str]]:
         """
         Finds the existing voice and persona for a character, or assigns a new voice
-        and stores the provided persona instructions.
+        and stores the provided persona instructions. Same as propose_voice() followed
+        by commit_voice().
 
         Args:
             character_name: The name of the character.
@@ -146,76 +322,97 @@ class VoiceSelector:
             Returns (None, None) if no suitable voice can be found/assigned.
         """
         if character_name == "Unknown":
-             print("Character name is 'Unknown'. Using default fallback voice and no persona.")
-             # Return fallback ID and empty persona
-             return DEFAULT_FALLBACK or None, "" # Return fallback or None if no fallback set
-
-        # 1. Check if character already exists
-        if character_name in self.character_map:
-            existing_data = self.character_map[character_name]
-            voice_id = existing_data.get('voice_id')
-            persona = existing_data.get('persona_instructions', '') # Get existing persona
-            print(f"Found existing voice mapping for '{character_name}': {voice_id}")
-            if persona:
-                print(f"  -> Using stored persona.") # Don't print the whole persona here
-            return voice_id, persona
+             return self._unknown_result
+
+        # 1. Check if character already exists (the common case once a session is underway,
+        #    so one dict probe and no console output)
+        existing = self.character_map.get(character_name)
+        if existing is not None:
+            return existing.get('voice_id'), existing.get('persona_instructions', _EMPTY)
 
         # 2. Character is new, assign a voice and store persona
-        print(f"No existing voice mapping found for '{character_name}'. Assigning new voice...")
+        voice_id, pending = self.propose_voice(character_name, gender)
+        if pending is None:
+            return None, None # Cannot assign
+        return self.commit_voice(pending, new_persona_instructions)
+
+    def propose_voice(self, character_name: str, gender: str) -> Tuple[Optional[str], Optional[Tuple[str, str]]]:
+        """
+        Picks the voice for a character without storing anything, so a new character is only
+        added to the map (and saved) once its voice was actually used.
+
+        Returns:
+            (voice_id, pending). For a new character, pass pending to commit_voice() to store the
+            mapping. pending is None when there is nothing to store: the character is already
+            mapped or is "Unknown" (voice_id is then its stored/fallback voice), or no voice
+            could be found (voice_id is None).
+        """
+        if character_name == "Unknown":
+             return self._unknown_result[0], None
+        existing = self.character_map.get(character_name)
+        if existing is not None:
+            return existing['voice_id'], None
+
+        logger.debug("No existing voice mapping found for '%s'. Assigning new voice...", character_name)
         assigned_voice_id = None
-        assigned_voice_name = "N/A" # For printing
+        assigned_voice_name = "N/A" # For logging
 
         # Determine which list of voices to use
-        gender_key = gender.lower() if gender in ["Male", "Female"] else None
-        voice_list = []
-        if gender_key:
-            voice_list = self.available_voices.get(gender_key, [])
-
-        # Fallback to opposite gender or combined list if primary is empty
-        if not voice_list:
-            print(f"Warning: No voices available for specified gender '{gender}'. Trying opposite or combined list.")
-            opposite_gender_key = 'female' if gender_key == 'male' else 'male'
-            voice_list = self.available_voices.get(opposite_gender_key, [])
-            if not voice_list: # If still empty, try combining all
-                 voice_list = self.available_voices.get('male', []) + self.available_voices.get('female', [])
-
-        # Filter out already used voices
-        used_voice_ids = {data['voice_id'] for data in self.character_map.values()}
-        available_pool = [v for v in voice_list if v['id'] not in used_voice_ids]
-
-        if available_pool:
-            selected_voice = random.choice(available_pool)
-            assigned_voice_id = selected_voice['id']
-            assigned_voice_name = selected_voice['name']
-            print(f"Assigned new {gender or 'Unknown Gender'} voice: {assigned_voice_name} ({assigned_voice_id})")
+        order = _GENDER_ORDER.get(gender)
+        if order is not None and self._voice_ids[order[0]]:
+            gender_key = order[0]
+        else:
+            # Fallback to the other list if the primary is empty (or the gender is unknown)
+            logger.warning("No voices available for specified gender '%s'. Trying opposite or combined list.", gender)
+            candidates = order[1:] if order is not None else _NO_GENDER_ORDER
+            gender_key = next((g for g in candidates if self._voice_ids[g]), candidates[0])
+
+        selected_voice = self._next_free_voice(gender_key) # Skips already used voices
+        if selected_voice is not None:
+            assigned_voice_id, assigned_voice_name = selected_voice
+            logger.debug("Assigned new %s voice: %s (%s)", gender or 'Unknown Gender', assigned_voice_name, assigned_voice_id)
         else:
             # No unused voices, maybe reuse one? Or use fallback?
-            print(f"Warning: No unused voices available for {gender}. Attempting to reuse or use fallback.")
+            logger.warning("No unused voices available for %s. Attempting to reuse or use fallback.", gender)
             # Option 1: Reuse a random voice from the original list (if any exist)
-            if voice_list:
-                 selected_voice = random.choice(voice_list)
-                 assigned_voice_id = selected_voice['id']
-                 assigned_voice_name = selected_voice['name']
-                 print(f"Reusing voice: {assigned_voice_name} ({assigned_voice_id})")
+            if self._voice_ids[gender_key]:
+                 i = random.randrange(len(self._voice_ids[gender_key]))
+                 assigned_voice_id = self._voice_ids[gender_key][i]
+                 assigned_voice_name = self._voice_names[gender_key][i]
+                 logger.debug("Reusing voice: %s (%s)", assigned_voice_name, assigned_voice_id)
             # Option 2: Use default fallback if reuse failed
-            elif DEFAULT_FALLBACK:
-                 assigned_voice_id = DEFAULT_FALLBACK
-                 assigned_voice_name = f"Default Fallback ({DEFAULT_FALLBACK})"
-                 print(f"Using default fallback voice: {assigned_voice_id}")
+            elif _default_fallback():
+                 assigned_voice_id = _default_fallback()
+                 assigned_voice_name = f"Default Fallback ({assigned_voice_id})"
+                 logger.debug("Using default fallback voice: %s", assigned_voice_id)
             else:
-                 print("Error: No voices available and no fallback configured. Cannot assign voice.")
+                 logger.error("No voices available and no fallback configured. Cannot assign voice.")
                  return None, None # Cannot assign
 
+        return assigned_voice_id, (character_name, assigned_voice_id)
+
+    def commit_voice(self, pending: Tuple[str, str], persona_instructions: str = "") -> Tuple[str, str]:
+        """
+        Stores a mapping proposed by propose_voice() with the given persona instructions.
+        If the character was mapped in the meantime, that mapping is kept.
+        Returns (voice_id, persona_instructions) as stored.
+        """
+        character_name, voice_id = pending
+        existing = self.character_map.get(character_name)
+        if existing is not None:
+            return existing['voice_id'], existing['persona_instructions']
+
         # Store the new mapping with the provided persona instructions
-        self.character_map[character_name] = {
-            'voice_id': assigned_voice_id,
-            'persona_instructions': new_persona_instructions or "" # Store empty if none provided
+        stored = self.character_map[sys.intern(character_name)] = {
+            'voice_id': voice_id,
+            'persona_instructions': persona_instructions or _EMPTY # Store empty if none provided
         }
+        self._used_voice_ids.add(voice_id) # Also takes it out of the free queues
         self.needs_saving = True
-        if new_persona_instructions:
-            print(f"  -> Stored newly generated persona for '{character_name}'.")
+        self._dirty_count += 1
+        if persona_instructions:
+            logger.debug("  -> Stored newly generated persona for '%s'.", character_name)
         else:
-            print(f"  -> No persona instructions provided or generated for new character '{character_name}'. Stored empty.")
-
+            logger.debug("  -> No persona instructions provided or generated for new character '%s'. Stored empty.", character_name)
 
-        return assigned_voice_id, new_persona_instructions or ""
\ No newline at end of file
+        return stored['voice_id'], stored['persona_instructions'] # Exactly what was stored